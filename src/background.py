@@ -0,0 +1,22 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine
+
+
+class BackgroundLoop:
+    """
+    An asyncio event loop running in a daemon thread.
+
+    Lets a synchronous caller such as a Streamlit script submit workflow runs and poll
+    for their results without blocking, while every run shares one loop and one scheduler.
+    """
+
+    def __init__(self, name: str = "blog-post-generator-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        """Schedules `coro` on the background loop and returns a future for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
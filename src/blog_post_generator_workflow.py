@@ -1,5 +1,7 @@
 import asyncio
 import os
+import re
+import time
 import yaml
 from openinference.instrumentation.agno import AgnoInstrumentor
 from opentelemetry import trace as trace_api
@@ -9,121 +11,417 @@ from opentelemetry.sdk.trace.export import SimpleSpanProcessor
 from agno.workflow.v2.workflow import Workflow
 from dotenv import load_dotenv
 from agno.storage.sqlite import SqliteStorage
-from typing import Optional, Any
-
-from .models import BlogStrategy, FinalBlogPost, SEOReport, BlogDraft
-from .agents import (
-    content_team,
-    editor_fact_checker_team,
-    seo_optimizer,
-    topic_strategist,
+from datetime import date
+from typing import Optional, Any, Tuple, Type
+
+from pydantic import BaseModel
+
+from agno.run.response import RunResponseContentEvent
+
+from .models import (
+    BlogDraft,
+    BlogOutline,
+    BlogStrategy,
+    FinalBlogPost,
+    FinalBlogPostEdits,
+    ResearchReport,
+    SEOReport,
 )
+from .agents import AgentSet, Credentials, build_agent_set
+from .draft_edits import DraftEditError, apply_draft_edits
+from .output_repair import extract_json, record_repair, repair_structured_output, start_run_repair_stats
+from .cache_store import CacheStore, create_sqlite_engine
+from .replay import replay_store, save_run, start_replay_run
+from .scheduler import GenerationScheduler
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Set the endpoint and headers for LangSmith
-endpoint = f'{os.getenv("LANGSMITH_ENDPOINT")}/otel/v1/traces'
-headers = {
-    "x-api-key": os.getenv("LANGSMITH_API_KEY"),
-    "Langsmith-Project": os.getenv("LANGSMITH_PROJECT"),
-}
-
-# Configure the tracer provider
-tracer_provider = TracerProvider()
-tracer_provider.add_span_processor(
-    SimpleSpanProcessor(OTLPSpanExporter(endpoint=endpoint, headers=headers))
-)
-trace_api.set_tracer_provider(tracer_provider=tracer_provider)
+# Load configuration from YAML file
+with open("config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+storage_config = config.get("storage", {})
+workflow_config = config.get("workflow", {})
+
+# Replayed runs are offline, so they skip exporting traces to LangSmith.
+if replay_store is None or replay_store.mode != "replay":
+    # Set the endpoint and headers for LangSmith
+    endpoint = f'{os.getenv("LANGSMITH_ENDPOINT")}/otel/v1/traces'
+    headers = {
+        "x-api-key": os.getenv("LANGSMITH_API_KEY"),
+        "Langsmith-Project": os.getenv("LANGSMITH_PROJECT"),
+    }
+
+    # Configure the tracer provider
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(
+        SimpleSpanProcessor(OTLPSpanExporter(endpoint=endpoint, headers=headers))
+    )
+    trace_api.set_tracer_provider(tracer_provider=tracer_provider)
 
-AgnoInstrumentor().instrument()
+    AgnoInstrumentor().instrument()
 
 
 # --- Caching Helper Functions ---
-def get_cached_data(workflow: Workflow, key: str, topic: str) -> Optional[Any]:
-    """Gets cached data from the workflow session state for a specific topic."""
-    return workflow.workflow_session_state.get(key, {}).get(topic)
+# Step results are cached one row per (key, topic) in the same SQLite file as the workflow
+# storage, so several worker processes can share the cache without overwriting each other.
+cache_store = CacheStore(
+    db_file=storage_config.get("db_file", "tmp/blog_post_generator.db"),
+    table_name=storage_config.get("cache_table", "step_cache"),
+    busy_timeout_ms=storage_config.get("busy_timeout_ms", 5000),
+)
+
+def get_cached_data(key: str, topic: str) -> Optional[Any]:
+    """
+    Gets cached data from the cache store for a specific topic.
+    Recorded and replayed runs always miss, so every step really runs.
+    """
+    if replay_store is not None:
+        return None
+    return cache_store.get(key, topic)
+
+def set_cached_data(key: str, topic: str, data: Any):
+    """
+    Sets data in the cache store for a specific topic.
+    Recorded and replayed runs are not cached, so they never replace real results or get exported.
+    """
+    if replay_store is not None:
+        return
+    cache_store.set(key, topic, data.model_dump() if hasattr(data, 'model_dump') else data)
+
+# --- Structured Output Helper Functions ---
+async def arun_structured(agent: Any, prompt: str, response_model: Type[BaseModel], error_message: str) -> Any:
+    """
+    Runs an agent or team and returns its output as `response_model`.
+    Malformed output is repaired locally first; the model is only re-asked once if that fails.
+    """
+    response = await agent.arun(prompt)
+    content = repair_structured_output(response.content if response else None, response_model)
+    if content is None:
+        record_repair("reasked")
+        print(f"   - Could not repair {response_model.__name__} locally. Re-asking the model.")
+        response = await agent.arun(prompt)
+        content = repair_structured_output(response.content if response else None, response_model)
+    if content is None:
+        record_repair("failed")
+        raise ValueError(error_message)
+    return content
+
+# --- Speculative Research Helper Functions ---
+def build_research_prompt(strategy: BlogStrategy) -> str:
+    """Builds the Research Analyst prompt for a strategy."""
+    return f"""
+        Blog Post Title: {strategy.title}
+        Subtopics: {', '.join(strategy.subtopics)}
+        Keywords: {', '.join(strategy.keywords)}
+
+        Please research this topic and produce a research report.
+        """
+
+def value_is_closed(streamed: str, key: str) -> bool:
+    """
+    Returns True once the string or array value of `key` has been fully written in the streamed JSON.
+    Brackets and quotes inside strings are skipped, so an unfinished item is never counted as closed.
+    """
+    match = re.search(rf'"{re.escape(key)}"\s*:\s*', streamed)
+    if not match:
+        return False
+    depth = 0
+    in_string = False
+    escaped = False
+    for char in streamed[match.end():]:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                if depth == 0:
+                    return True
+        elif char == '"':
+            in_string = True
+        elif char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+            if depth == 0:
+                return True
+    return False
+
+
+def parse_partial_strategy(streamed: str) -> Optional[BlogStrategy]:
+    """
+    Parses a strategy from the JSON streamed so far, keeping only keywords that are fully written.
+    Returns None until the title and subtopics are complete and the keyword list has started.
+    """
+    if not (value_is_closed(streamed, "title") and value_is_closed(streamed, "subtopics")):
+        return None
+    data = extract_json(streamed)
+    if not isinstance(data, dict) or not isinstance(data.get("keywords"), list):
+        return None
+    keywords = [keyword for keyword in data["keywords"] if isinstance(keyword, str)]
+    if not value_is_closed(streamed, "keywords"):
+        # The keyword list is still open, so its last item may be cut off.
+        keywords = keywords[:-1]
+    try:
+        return BlogStrategy(title=data.get("title"), subtopics=data.get("subtopics"), keywords=keywords)
+    except ValueError:
+        return None
+
+async def generate_strategy_with_speculative_research(
+    agents: AgentSet,
+    strategy_prompt: str,
+) -> Tuple[BlogStrategy, Optional[ResearchReport]]:
+    """
+    Streams the strategy and starts the Research Analyst as soon as enough keywords have arrived.
+    The speculative research is kept only if the final strategy has the same title and subtopics
+    and still contains every keyword it was started with; otherwise it is cancelled.
+    """
+    min_keywords = workflow_config.get("speculative_min_keywords", 5)
+    streamed = ""
+    speculative_strategy = None
+    research_task = None
+
+    try:
+        async for event in await agents.streaming_topic_strategist.arun(strategy_prompt, stream=True):
+            if not isinstance(event, RunResponseContentEvent) or not isinstance(event.content, str):
+                continue
+            streamed += event.content
+            if research_task is None:
+                partial = parse_partial_strategy(streamed)
+                if partial and len(partial.keywords) >= min_keywords:
+                    speculative_strategy = partial
+                    print(f"   - Starting speculative research with {len(partial.keywords)} keywords.")
+                    research_task = asyncio.create_task(
+                        arun_structured(
+                            agents.research_analyst,
+                            build_research_prompt(partial),
+                            ResearchReport,
+                            "Failed to create the research report.",
+                        )
+                    )
+
+        strategy = repair_structured_output(streamed, BlogStrategy)
+        if strategy is None:
+            record_repair("reasked")
+            strategy = await arun_structured(
+                agents.topic_strategist, strategy_prompt, BlogStrategy, "Failed to generate a blog strategy."
+            )
+
+        if research_task is None:
+            return strategy, None
+        if (
+            speculative_strategy.title != strategy.title
+            or speculative_strategy.subtopics != strategy.subtopics
+            or not set(speculative_strategy.keywords) <= set(strategy.keywords)
+        ):
+            print("   - Final strategy differs from the speculative one. Cancelling speculative research.")
+            return strategy, None
+        try:
+            return strategy, await research_task
+        except Exception as e:
+            # Speculation is only an optimisation: any failure falls back to step 2's own research.
+            # CancelledError is a BaseException, so cancelling the workflow still propagates.
+            print(f"   - Speculative research failed ({e!r}).")
+            return strategy, None
+    finally:
+        # Don't leave the research running (and spending tokens) if its result isn't used,
+        # including when the stream or the strategy fallback raises.
+        if research_task is not None and not research_task.done():
+            research_task.cancel()
+
+# --- Content Pipeline Helper Functions ---
+async def create_first_draft_with_pipeline(
+    agents: AgentSet, idea: str, strategy: BlogStrategy, research: Optional[ResearchReport] = None
+) -> BlogDraft:
+    """
+    Creates the first draft by calling the Content Team's members directly, in order,
+    instead of going through the team coordinator. Pass `research` if it was already done.
+    """
+    if research is None:
+        cached_research = get_cached_data("research", idea)
+        if cached_research:
+            research = ResearchReport.model_validate(cached_research)
+            print("   - Found cached research report.")
+    if research is None:
+        research = await arun_structured(
+            agents.research_analyst, build_research_prompt(strategy), ResearchReport, "Failed to create the research report."
+        )
+        set_cached_data("research", idea, research)
+        print("   - Research report created.")
+
+    outline_prompt = f"""
+        Blog Post Title: {strategy.title}
+        Subtopics: {', '.join(strategy.subtopics)}
+        Keywords: {', '.join(strategy.keywords)}
+
+        Research Summaries: {research.summaries}
+        Key Findings: {research.key_findings}
+
+        Please create an SEO-optimized outline for the blog post.
+        """
+    outline = await arun_structured(
+        agents.outline_generator, outline_prompt, BlogOutline, "Failed to create the blog outline."
+    )
+    print("   - Outline created.")
+
+    writer_prompt = f"""
+        Blog Post Title: {strategy.title}
+        Keywords: {', '.join(strategy.keywords)}
+
+        Outline:
+        {chr(10).join(outline.outline)}
+
+        Research Summaries: {research.summaries}
+        Key Findings: {research.key_findings}
 
-def set_cached_data(workflow: Workflow, key: str, topic: str, data: Any):
-    """Sets data in the workflow session state for a specific topic."""
-    if key not in workflow.workflow_session_state:
-        workflow.workflow_session_state[key] = {}
-    workflow.workflow_session_state[key][topic] = data.model_dump() if hasattr(data, 'model_dump') else data
+        Please write the first draft of the blog post following the outline.
+        """
+    return await arun_structured(
+        agents.content_writer, writer_prompt, BlogDraft, "Failed to create the first draft."
+    )
+
+# --- Editing Helper Functions ---
+async def edit_with_draft_edits(
+    agents: AgentSet, editing_prompt: str, first_draft: BlogDraft
+) -> Optional[FinalBlogPost]:
+    """
+    Asks the editing team for targeted edits and applies them locally to the first draft.
+    Returns None when the edits are missing or don't apply cleanly, so the caller can
+    fall back to regenerating the full draft.
+    """
+    try:
+        post_edits = await arun_structured(
+            agents.editor_fact_checker_edits_team, editing_prompt, FinalBlogPostEdits, "Failed to get draft edits."
+        )
+    except ValueError:
+        print("   - Editing team returned no usable edits. Falling back to full regeneration.")
+        return None
+    try:
+        draft = apply_draft_edits(first_draft.draft, post_edits.edits)
+    except DraftEditError as e:
+        print(f"   - Edits did not apply ({e}). Falling back to full regeneration.")
+        return None
+    print(f"   - Applied {len(post_edits.edits)} edits to the first draft.")
+    return FinalBlogPost(
+        title=post_edits.title,
+        date=date.today().isoformat(),
+        tags=post_edits.tags,
+        draft=draft,
+    )
 
 # --- Main Execution Function ---
 async def blog_post_generation_workflow(
     workflow: Workflow,
     idea: str,
     tone: str,
+    agents: Optional[AgentSet] = None,
 ) -> FinalBlogPost:
     """
     Orchestrates the entire blog post generation process from idea to final draft.
+    Pass `agents` to run with a specific set of agents, e.g. built with per-user credentials.
     """
     print("--- Starting Blog Post Generation Workflow ---")
 
     # Check for fully cached final blog post first
-    cached_final_post = get_cached_data(workflow, "final_post", idea)
+    cached_final_post = get_cached_data("final_post", idea)
     if cached_final_post:
         print("Found cached final blog post. Returning it.")
         return FinalBlogPost.model_validate(cached_final_post)
 
+    agents = agents or build_agent_set()
+    run_repair_stats = start_run_repair_stats()
+    start_replay_run()
+    step_timings = {}
+
     # 1. Generate Strategy
     print("\nStep 1: Generating Blog Strategy...")
-    strategy = get_cached_data(workflow, "strategy", idea)
+    step_started = time.perf_counter()
+    # Research kept from step 1 is handed to step 2 directly, so it is reused even when the
+    # step cache is bypassed (e.g. while recording or replaying).
+    research = None
+    strategy = get_cached_data("strategy", idea)
     if strategy:
         strategy = BlogStrategy.model_validate(strategy)
         print("   - Found cached strategy.")
     else:
         print("Cache Not Found Blog Strategy")
         strategy_prompt = f"Generate a blog post strategy for the idea '{idea}' with a '{tone}' tone."
-        strategy_response = await topic_strategist.arun(strategy_prompt)
-        if not strategy_response or not strategy_response.content:
-            raise ValueError("Failed to generate a blog strategy.")
-        strategy = strategy_response.content
-        set_cached_data(workflow, "strategy", idea, strategy)
+        if workflow_config.get("speculative_research", False):
+            strategy, research = await generate_strategy_with_speculative_research(agents, strategy_prompt)
+            if research:
+                set_cached_data("research", idea, research)
+        else:
+            strategy = await arun_structured(
+                agents.topic_strategist, strategy_prompt, BlogStrategy, "Failed to generate a blog strategy."
+            )
+        set_cached_data("strategy", idea, strategy)
         print(f"   - Strategy Title: {strategy.title}")
 
+    step_timings["strategy"] = time.perf_counter() - step_started
+
     # 2. Create First Draft
     print("\nStep 2: Creating First Draft...")
-    first_draft = get_cached_data(workflow, "first_draft", idea)
+    step_started = time.perf_counter()
+    first_draft = get_cached_data("first_draft", idea)
     if first_draft:
         first_draft = BlogDraft.model_validate(first_draft)
         print("   - Found cached first draft.")
     else:
         print("Cache Not Found First Draft")
-        content_prompt = f"""
-        Blog Post Title: {strategy.title}
-        Subtopics: {', '.join(strategy.subtopics)}
-        Keywords: {', '.join(strategy.keywords)}
+        if workflow_config.get("content_team_mode", "coordinator") == "pipeline":
+            first_draft = await create_first_draft_with_pipeline(agents, idea, strategy, research)
+        else:
+            content_prompt = f"""
+            Blog Post Title: {strategy.title}
+            Subtopics: {', '.join(strategy.subtopics)}
+            Keywords: {', '.join(strategy.keywords)}
 
-        Please generate the first draft of the blog post.
-        """
-        draft_response = await content_team.arun(content_prompt)
-        if not draft_response or not draft_response.content:
-            raise ValueError("Failed to create the first draft.")
-        first_draft = draft_response.content
-        set_cached_data(workflow, "first_draft", idea, first_draft)
+            Please generate the first draft of the blog post.
+            """
+            if research is None:
+                cached_research = get_cached_data("research", idea)
+                research = ResearchReport.model_validate(cached_research) if cached_research else None
+            if research:
+                content_prompt += f"""
+            The research for this post has already been done. Skip the Research Analyst and
+            give this research report to the Outline Generator and Content Writer.
+
+            Summaries: {research.summaries}
+            Key Findings: {research.key_findings}
+            """
+            first_draft = await arun_structured(
+                agents.content_team, content_prompt, BlogDraft, "Failed to create the first draft."
+            )
+        set_cached_data("first_draft", idea, first_draft)
         print("   - First draft created successfully.")
 
+    step_timings["first_draft"] = time.perf_counter() - step_started
+
     # 3. SEO Optimization
     print("\nStep 3: Optimizing for SEO...")
-    seo_report = get_cached_data(workflow, "seo_report", idea)
+    step_started = time.perf_counter()
+    seo_report = get_cached_data("seo_report", idea)
     if seo_report:
         seo_report = SEOReport.model_validate(seo_report)
         print("   - Found cached SEO report.")
     else:
         print("Cache Not Found SEO Report")
         seo_prompt = f"Analyze the following blog post draft for SEO and provide suggestions:\n\n{first_draft.draft}"
-        seo_response = await seo_optimizer.arun(seo_prompt)
-        if not seo_response or not seo_response.content:
-            raise ValueError("Failed to get SEO suggestions.")
-        seo_report = seo_response.content
-        set_cached_data(workflow, "seo_report", idea, seo_report)
+        seo_report = await arun_structured(
+            agents.seo_optimizer, seo_prompt, SEOReport, "Failed to get SEO suggestions."
+        )
+        set_cached_data("seo_report", idea, seo_report)
     print(f"   - SEO Score: {seo_report.seo_score}")
 
+    step_timings["seo_report"] = time.perf_counter() - step_started
+
     # 4. Editing and Fact-Checking
     print("\nStep 4: Editing and Fact-Checking...")
-    final_post = get_cached_data(workflow, "final_post", idea)
+    step_started = time.perf_counter()
+    final_post = get_cached_data("final_post", idea)
     if final_post:
         final_post = FinalBlogPost.model_validate(final_post)
         print("   - Found cached final post.")
@@ -136,42 +434,85 @@ async def blog_post_generation_workflow(
         Draft:
         {first_draft.draft}
         """
-        final_response = await editor_fact_checker_team.arun(editing_prompt)
-        if not final_response or not final_response.content:
-            raise ValueError("Failed to edit and fact-check the draft.")
-        final_post = final_response.content
-        set_cached_data(workflow, "final_post", idea, final_post)
+        final_post = None
+        if workflow_config.get("edit_mode", "full") == "edits":
+            final_post = await edit_with_draft_edits(agents, editing_prompt, first_draft)
+        if final_post is None:
+            final_post = await arun_structured(
+                agents.editor_fact_checker_team, editing_prompt, FinalBlogPost, "Failed to edit and fact-check the draft."
+            )
+        set_cached_data("final_post", idea, final_post)
         print("   - Final blog post is ready!")
 
+    print(
+        f"\nStructured outputs this run: {run_repair_stats['parsed']} parsed, {run_repair_stats['repaired']} repaired locally, "
+        f"{run_repair_stats['reasked']} re-asked, {run_repair_stats['failed']} failed."
+    )
+    step_timings["final_post"] = time.perf_counter() - step_started
+    print("Step timings: " + ", ".join(f"{step} {seconds:.1f}s" for step, seconds in step_timings.items()))
+
+    run_path = save_run(final_post, step_timings)
+    if run_path:
+        print(f"Saved run to {run_path}")
+
     print("\n--- Workflow Finished ---")
     return final_post
 
 
 # --- Workflow Definition ---
-# Load configuration from YAML file
-with open("config.yaml", "r") as f:
-    config = yaml.safe_load(f)
-
-storage_config = config.get("storage", {})
-
-workflow = Workflow(
-    name="Blog Post Generator",
-    description="A workflow to generate a blog post from a user's idea.",
-    steps=blog_post_generation_workflow,
-    storage=SqliteStorage(
-        table_name=storage_config.get("table_name", "blog_post_generator_cache"),
-        db_file=storage_config.get("db_file", "tmp/blog_post_generator.db"),
-        mode="workflow_v2",
+storage = SqliteStorage(
+    table_name=storage_config.get("table_name", "blog_post_generator_cache"),
+    db_engine=create_sqlite_engine(
+        storage_config.get("db_file", "tmp/blog_post_generator.db"),
+        busy_timeout_ms=storage_config.get("busy_timeout_ms", 5000),
     ),
-    workflow_session_state={}, 
+    mode="workflow_v2",
 )
 
+def create_workflow() -> Workflow:
+    """
+    Creates a workflow backed by the shared storage. Each concurrent run should use its own
+    workflow so runs don't share session state. Step results are shared through `cache_store`.
+    """
+    return Workflow(
+        name="Blog Post Generator",
+        description="A workflow to generate a blog post from a user's idea.",
+        steps=blog_post_generation_workflow,
+        storage=storage,
+        workflow_session_state={},
+    )
+
+workflow = create_workflow()
+
+scheduler = GenerationScheduler.from_config(config.get("scheduler", {}), storage_config)
+
+async def generate_blog_post(
+    idea: str,
+    tone: str,
+    priority: str = "interactive",
+    tenant: str = "default",
+    session_id: Optional[str] = None,
+    credentials: Optional[Credentials] = None,
+) -> Any:
+    """
+    Runs the workflow once a slot is free for the given priority class and tenant.
+    Each call gets its own workflow and agents, using `credentials` instead of the environment where given.
+    """
+    run_workflow = create_workflow()
+    return await scheduler.run(
+        lambda: run_workflow.arun(
+            idea=idea, tone=tone, session_id=session_id, agents=build_agent_set(credentials)
+        ),
+        priority=priority,
+        tenant=tenant,
+    )
+
 if __name__ == "__main__":
     idea = "The future of AI in content creation"
     tone = "Informative and engaging"
 
     async def main():
-        result = await workflow.arun(idea=idea, tone=tone)
+        result = await generate_blog_post(idea, tone, priority="interactive")
         print("\n--- Final Blog Post Output ---")
         if result and result.content:
             final_post = result.content
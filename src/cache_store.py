@@ -0,0 +1,118 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+
+def configure_sqlite_connection(connection: Any, busy_timeout_ms: int):
+    """Puts a SQLite connection in WAL mode so readers don't block the single writer."""
+    cursor = connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+    cursor.close()
+
+
+def connect(db_file: str, busy_timeout_ms: int = 5000) -> sqlite3.Connection:
+    """
+    Opens a SQLite connection in autocommit mode, so every statement is its own short
+    transaction unless the caller explicitly begins one.
+    """
+    Path(db_file).resolve().parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_file, timeout=busy_timeout_ms / 1000, isolation_level=None)
+    configure_sqlite_connection(connection, busy_timeout_ms)
+    return connection
+
+
+def create_sqlite_engine(db_file: str, busy_timeout_ms: int = 5000) -> Engine:
+    """Creates a SQLAlchemy engine whose connections use WAL mode, for agno's SqliteStorage."""
+    db_path = Path(db_file).resolve()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"timeout": busy_timeout_ms / 1000})
+    event.listen(engine, "connect", lambda connection, _: configure_sqlite_connection(connection, busy_timeout_ms))
+    return engine
+
+
+class CacheStore:
+    """
+    Step-level cache of workflow results, one row per (key, topic).
+
+    Each write is a single-row upsert, so several worker processes can cache results in the
+    same database without rewriting a shared session blob or losing each other's writes.
+
+    Every write also takes the next `seq`, assigned inside the upsert while it holds the write
+    lock, so `seq` order is commit order. Readers that export incrementally use it as their
+    watermark; `updated_at` is stamped before the commit and can be out of order.
+    """
+
+    def __init__(self, db_file: str, table_name: str = "step_cache", busy_timeout_ms: int = 5000):
+        self.db_file = db_file
+        self.table_name = table_name
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._connection().execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                key TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                seq INTEGER,
+                PRIMARY KEY (key, topic)
+            )
+            """
+        )
+        self._add_seq_column()
+        self._connection().execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table_name}_key_updated ON {self.table_name} (key, updated_at)"
+        )
+        self._connection().execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table_name}_key_seq ON {self.table_name} (key, seq)"
+        )
+
+    def _add_seq_column(self):
+        # Tables created before `seq` existed: number the existing rows in write order. The check
+        # is repeated under the write lock in case another process is migrating at the same time.
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [row[1] for row in connection.execute(f"PRAGMA table_info({self.table_name})")]
+            if "seq" not in columns:
+                connection.execute(f"ALTER TABLE {self.table_name} ADD COLUMN seq INTEGER")
+                connection.execute(f"UPDATE {self.table_name} SET seq = rowid")
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads, so keep one per thread.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = connect(self.db_file, self.busy_timeout_ms)
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str, topic: str) -> Optional[Any]:
+        """Returns the cached data for a key and topic, or None."""
+        row = self._connection().execute(
+            f"SELECT data FROM {self.table_name} WHERE key = ? AND topic = ?", (key, topic)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, topic: str, data: Any):
+        """Inserts or replaces the cached data for a key and topic."""
+        self._connection().execute(
+            f"""
+            INSERT INTO {self.table_name} (key, topic, data, updated_at, seq)
+            VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM {self.table_name}))
+            ON CONFLICT (key, topic) DO UPDATE
+            SET data = excluded.data, updated_at = excluded.updated_at, seq = excluded.seq
+            """,
+            (key, topic, json.dumps(data), time.time()),
+        )
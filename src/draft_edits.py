@@ -0,0 +1,42 @@
+from typing import List
+
+from .models import DraftEdit
+
+
+class DraftEditError(ValueError):
+    """Raised when a list of edits cannot be applied cleanly to a draft."""
+
+
+def apply_draft_edits(draft: str, edits: List[DraftEdit]) -> str:
+    """
+    Applies find-and-replace edits to a draft.
+
+    Every `find` snippet must occur exactly once in the original draft, so an
+    ambiguous or hallucinated edit is rejected rather than silently changing the
+    wrong sentence. All snippets are located before anything is replaced, so one
+    edit's replacement text can't break a later edit; overlapping edits are rejected.
+    """
+    spans = []
+    for index, edit in enumerate(edits):
+        if not edit.find:
+            raise DraftEditError(f"Edit {index} has an empty `find` snippet.")
+        occurrences = draft.count(edit.find)
+        if occurrences != 1:
+            raise DraftEditError(
+                f"Edit {index} matches {occurrences} times, expected exactly once: {edit.find[:80]!r}"
+            )
+        start = draft.index(edit.find)
+        spans.append((start, start + len(edit.find), index, edit.replace))
+
+    spans.sort()
+    for (_, previous_end, previous_index, _), (start, _, index, _) in zip(spans, spans[1:]):
+        if start < previous_end:
+            raise DraftEditError(f"Edits {previous_index} and {index} overlap.")
+
+    # Apply from the end of the draft backwards, so earlier offsets stay valid.
+    for start, end, _, replace in reversed(spans):
+        draft = draft[:start] + replace + draft[end:]
+
+    if not draft.strip():
+        raise DraftEditError("Applying the edits produced an empty draft.")
+    return draft
@@ -0,0 +1,277 @@
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import yaml
+
+from .cache_store import connect
+from .models import FinalBlogPost
+
+# Load configuration from YAML file
+with open("config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+storage_config = config.get("storage", {})
+export_config = config.get("export", {})
+
+EXPORT_FORMATS = ("markdown", "jsonl", "static-site")
+
+
+@dataclass
+class ExportedPost:
+    """
+    A final blog post read from the cache store, with the topic it was generated for.
+    `date` is the post's own date if it is a valid YYYY-MM-DD date, else the day it was cached.
+    """
+
+    topic: str
+    seq: int
+    updated_at: float
+    date: date
+    post: FinalBlogPost
+
+    @property
+    def file_stem(self) -> str:
+        """`<date>-<slug>-<topic hash>`, unique per topic even when two posts share a title and date."""
+        topic_hash = hashlib.sha1(self.topic.encode("utf-8")).hexdigest()[:8]
+        return f"{self.date.isoformat()}-{slugify(self.post.title)}-{topic_hash}"
+
+
+def slugify(title: str) -> str:
+    """Turns a post title into a lowercase, hyphen-separated file name."""
+    slug = re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+    return slug or "post"
+
+
+def parse_post_date(post: FinalBlogPost, updated_at: float) -> date:
+    """
+    Returns the post's date. The date is written by the model, so if it isn't a valid
+    YYYY-MM-DD date the day the post was cached is used instead.
+    """
+    try:
+        return date.fromisoformat(post.date.strip())
+    except ValueError:
+        return datetime.fromtimestamp(updated_at).date()
+
+
+def render_markdown(post: FinalBlogPost, post_date: Optional[date] = None) -> str:
+    """
+    Renders a post as markdown with YAML front matter (title, date, tags).
+    Pass `post_date` to use a parsed date instead of the post's own date string.
+    """
+    front_matter = yaml.safe_dump(
+        {"title": post.title, "date": post_date.isoformat() if post_date else post.date, "tags": list(post.tags)},
+        sort_keys=False,
+        allow_unicode=True,
+    )
+    return f"---\n{front_matter}---\n\n{post.draft.strip()}\n"
+
+
+def iter_final_posts(
+    connection: sqlite3.Connection,
+    table_name: str = "step_cache",
+    since: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    tags: Optional[List[str]] = None,
+    batch_size: int = 200,
+) -> Iterator[ExportedPost]:
+    """
+    Yields cached final posts oldest first, reading `batch_size` rows at a time so a large
+    campaign is never loaded into memory at once.
+
+    `since` only returns posts written after that cache `seq`. Dates are inclusive and compared
+    against `ExportedPost.date`; a post matches `tags` if it has any of them.
+    """
+    wanted_tags = {tag.lower() for tag in tags or []}
+    cursor = connection.execute(
+        f"""
+        SELECT topic, data, seq, updated_at FROM {table_name}
+        WHERE key = 'final_post' AND seq > ?
+        ORDER BY seq
+        """,
+        (since or 0,),
+    )
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for topic, data, seq, updated_at in rows:
+                post = FinalBlogPost.model_validate(json.loads(data))
+                post_date = parse_post_date(post, updated_at)
+                if date_from and post_date < date_from:
+                    continue
+                if date_to and post_date > date_to:
+                    continue
+                if wanted_tags and not wanted_tags & {tag.lower() for tag in post.tags}:
+                    continue
+                yield ExportedPost(topic=topic, seq=seq, updated_at=updated_at, date=post_date, post=post)
+    finally:
+        cursor.close()
+
+
+class PostExporter(ABC):
+    """
+    Writes posts to `output` one at a time. Subclasses implement `write` and may hold a file
+    open between `open` and `close`. File names are derived from the post and its topic, so
+    exporting the same post again overwrites it.
+    """
+
+    def __init__(self, output: Path, append: bool = False):
+        self.output = output
+        self.append = append
+
+    def open(self):
+        self.output.mkdir(parents=True, exist_ok=True)
+
+    @abstractmethod
+    def write(self, exported: ExportedPost):
+        """Writes one post."""
+
+    def close(self):
+        pass
+
+
+class MarkdownExporter(PostExporter):
+    """One `<date>-<slug>-<topic hash>.md` file per post, with front matter."""
+
+    def write(self, exported: ExportedPost):
+        path = self.output / f"{exported.file_stem}.md"
+        path.write_text(render_markdown(exported.post, exported.date), encoding="utf-8")
+
+
+class JsonlExporter(PostExporter):
+    """One JSON object per line in `output`. Incremental exports append to the archive."""
+
+    def open(self):
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.output, "a" if self.append else "w", encoding="utf-8")
+
+    def write(self, exported: ExportedPost):
+        record = {
+            "topic": exported.topic,
+            "updated_at": exported.updated_at,
+            **exported.post.model_dump(),
+            "date": exported.date.isoformat(),
+        }
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class StaticSiteExporter(PostExporter):
+    """
+    A static-site content directory (Hugo page bundles, also readable by most other generators):
+    `content/posts/<date>-<slug>-<topic hash>/index.md`, with the slug and topic added to the front matter.
+    """
+
+    def open(self):
+        self.posts_dir = self.output / "content" / "posts"
+        self.posts_dir.mkdir(parents=True, exist_ok=True)
+
+    def write(self, exported: ExportedPost):
+        bundle = self.posts_dir / exported.file_stem
+        bundle.mkdir(exist_ok=True)
+        markdown = render_markdown(exported.post, exported.date)
+        extra = yaml.safe_dump({"slug": bundle.name, "topic": exported.topic}, sort_keys=False, allow_unicode=True)
+        (bundle / "index.md").write_text(markdown.replace("---\n", f"---\n{extra}", 1), encoding="utf-8")
+
+
+EXPORTERS = {"markdown": MarkdownExporter, "jsonl": JsonlExporter, "static-site": StaticSiteExporter}
+
+
+def read_watermark(state_file: Path) -> Optional[int]:
+    """Returns the cache `seq` of the last exported post, or None if nothing was exported yet."""
+    if not state_file.exists():
+        return None
+    return json.loads(state_file.read_text()).get("seq")
+
+
+def write_watermark(state_file: Path, seq: int):
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    state_file.write_text(json.dumps({"seq": seq}))
+
+
+def export_posts(
+    export_format: str,
+    output: Path,
+    incremental: bool = False,
+    state_file: Optional[Path] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    tags: Optional[List[str]] = None,
+) -> int:
+    """
+    Streams cached final posts into `output` in the given format and returns how many were written.
+
+    With `incremental`, only posts cached since the last incremental export are written. The
+    watermark in `state_file` (by default next to the output) is saved even if the export is
+    interrupted, so the next run resumes after the last post written.
+    """
+    if export_format not in EXPORTERS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    state_file = state_file or output.with_name(f"{output.name}.export_state.json")
+    since = read_watermark(state_file) if incremental else None
+
+    connection = connect(
+        storage_config.get("db_file", "tmp/blog_post_generator.db"),
+        storage_config.get("busy_timeout_ms", 5000),
+    )
+    exporter = EXPORTERS[export_format](output, append=incremental)
+    exporter.open()
+    count = 0
+    last_seq = since
+    try:
+        for exported in iter_final_posts(
+            connection,
+            table_name=storage_config.get("cache_table", "step_cache"),
+            since=since,
+            date_from=date_from,
+            date_to=date_to,
+            tags=tags,
+            batch_size=export_config.get("batch_size", 200),
+        ):
+            exporter.write(exported)
+            count += 1
+            last_seq = exported.seq
+    finally:
+        exporter.close()
+        connection.close()
+        if incremental and last_seq is not None:
+            write_watermark(state_file, last_seq)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export generated blog posts from the cache store.")
+    parser.add_argument("format", choices=EXPORT_FORMATS)
+    parser.add_argument("--output", help="Output directory, or file for jsonl.")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="Only posts dated on or after YYYY-MM-DD.")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Only posts dated on or before YYYY-MM-DD.")
+    parser.add_argument("--tag", dest="tags", action="append", help="Only posts with this tag (repeatable).")
+    parser.add_argument("--incremental", action="store_true", help="Only export posts added since the last incremental run.")
+    parser.add_argument("--state-file", help="Where the incremental watermark is kept.")
+
+    args = parser.parse_args()
+    export_dir = Path(export_config.get("dir", "exports"))
+    default_output = export_dir / ("posts.jsonl" if args.format == "jsonl" else args.format)
+    output = Path(args.output) if args.output else default_output
+    count = export_posts(
+        args.format,
+        output,
+        incremental=args.incremental,
+        state_file=Path(args.state_file) if args.state_file else None,
+        date_from=args.date_from,
+        date_to=args.date_to,
+        tags=args.tags,
+    )
+    print(f"Exported {count} posts to {output}.")
@@ -1,4 +1,5 @@
 import yaml
+from typing import Optional
 from agno.embedder.openai import OpenAIEmbedder
 from agno.knowledge.json import JSONKnowledgeBase
 from agno.vectordb.qdrant import Qdrant
@@ -12,17 +13,20 @@ with open("config.yaml", "r") as f:
 
 qdrant_config = config.get("qdrant", {})
 
-# Create a knowledge base from the SEO_KnowledgeBase directory
-knowledge_base = JSONKnowledgeBase(
-    path=qdrant_config.get("path"),
-    vector_db=Qdrant(
-        collection=qdrant_config.get("collection_name"),
-        url=qdrant_config.get("url"),
-        api_key=qdrant_config.get("api_key"),
-        embedder=OpenAIEmbedder(id="text-embedding-3-small"),
-        search_type=SearchType.hybrid,
+def build_knowledge_base(openai_api_key: Optional[str] = None) -> JSONKnowledgeBase:
+    """Creates a knowledge base from the SEO_KnowledgeBase directory, embedding with the given OpenAI key."""
+    return JSONKnowledgeBase(
+        path=qdrant_config.get("path"),
+        vector_db=Qdrant(
+            collection=qdrant_config.get("collection_name"),
+            url=qdrant_config.get("url"),
+            api_key=qdrant_config.get("api_key"),
+            embedder=OpenAIEmbedder(id="text-embedding-3-small", api_key=openai_api_key),
+            search_type=SearchType.hybrid,
+        )
     )
-)
+
+knowledge_base = build_knowledge_base()
 
 if __name__ == "__main__":
     # Load the knowledge base
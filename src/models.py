@@ -97,4 +97,43 @@ class FinalBlogPost(BaseModel):
     )
     draft: str = Field(
         ..., description="The complete draft of the blog post in markdown format."
-    )
\ No newline at end of file
+    )
+
+class DraftEdit(BaseModel):
+    """
+    A single find-and-replace edit against the blog post draft.
+    """
+
+    find: str = Field(
+        ...,
+        description="An exact, verbatim snippet copied from the original draft. It must occur exactly once in the draft.",
+    )
+    replace: str = Field(
+        ...,
+        description="The text that replaces `find`. Use an empty string to delete the snippet, or repeat `find` plus new text to insert after it.",
+    )
+
+
+class DraftEdits(BaseModel):
+    """
+    A list of edits to apply to a blog post draft instead of rewriting it.
+    """
+
+    edits: List[DraftEdit] = Field(
+        ..., description="A list of find-and-replace edits, each matched against the original draft; they must not overlap."
+    )
+
+
+class FinalBlogPostEdits(BaseModel):
+    """
+    The final blog post metadata plus the edits to apply to the first draft.
+    """
+
+    title: str = Field(..., description="Title for the blog post.")
+    tags: List[str] = Field(
+        ..., description="A list of relevant SEO tags for the blog post."
+    )
+    edits: List[DraftEdit] = Field(
+        ...,
+        description="A list of find-and-replace edits to apply to the draft, each matched against the original draft; they must not overlap.",
+    )
@@ -0,0 +1,207 @@
+import json
+import re
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, List, Optional, Type, TypeVar, get_args, get_origin
+
+from pydantic import BaseModel, ValidationError
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# How each structured output was obtained: "parsed" (valid as returned), "repaired"
+# (fixed locally), "reasked" (needed another model call) or "failed".
+# Totals since the process started, across all workflow runs.
+repair_stats: Counter = Counter()
+
+# The same counts for the workflow run in the current context, if one was started.
+_run_repair_stats: ContextVar[Optional[Counter]] = ContextVar("run_repair_stats", default=None)
+
+# Numeric fields that are clamped into range instead of being rejected.
+NUMERIC_FIELD_RANGES = {"seo_score": (0.0, 100.0)}
+
+# List fields where a single-line string is split on commas rather than kept whole.
+COMMA_SEPARATED_FIELDS = {"keywords", "tags"}
+
+
+def start_run_repair_stats() -> Counter:
+    """
+    Starts counting structured outputs for the current workflow run and returns the counter.
+    Tasks created afterwards in the same context share it; concurrent runs each get their own.
+    """
+    stats = Counter()
+    _run_repair_stats.set(stats)
+    return stats
+
+
+def record_repair(outcome: str):
+    """Counts one structured output in the process-wide totals and the current run's counter."""
+    repair_stats[outcome] += 1
+    run_stats = _run_repair_stats.get()
+    if run_stats is not None:
+        run_stats[outcome] += 1
+
+
+_FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_BULLET_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+_NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def strip_code_fences(text: str) -> str:
+    """Returns the contents of the first markdown code fence, or the text itself if there is none."""
+    match = _FENCE_PATTERN.search(text)
+    return match.group(1).strip() if match else text.strip()
+
+
+def close_truncated_json(text: str) -> List[str]:
+    """
+    Returns candidate completions of a JSON document that was cut off mid-stream.
+
+    The first candidate closes any open string, array and object at the end of the
+    text. The second cuts back to the last comma, dropping a half-written key or value.
+    """
+    stack = []
+    in_string = False
+    escaped = False
+    last_comma = None
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+        elif char == ",":
+            last_comma = (index, list(stack))
+
+    def _close(head: str, open_brackets: List[str], open_string: bool) -> str:
+        if open_string:
+            head += '"'
+        head = head.rstrip()
+        if head.endswith(","):
+            head = head[:-1]
+        elif head.endswith(":"):
+            head += " null"
+        return head + "".join(reversed(open_brackets))
+
+    candidates = [_close(text, stack, in_string)]
+    if last_comma is not None:
+        index, comma_stack = last_comma
+        candidates.append(_close(text[:index], comma_stack, False))
+    return candidates
+
+
+def extract_json(text: str) -> Optional[Any]:
+    """Parses the JSON object in a model response, tolerating fences, surrounding prose and truncation."""
+    text = strip_code_fences(text)
+    start = text.find("{")
+    if start == -1:
+        return None
+    text = text[start:]
+    end = text.rfind("}")
+
+    candidates = []
+    if end != -1:
+        candidates.append(text[: end + 1])
+    candidates.extend(close_truncated_json(text))
+    for candidate in candidates:
+        try:
+            return json.loads(candidate, strict=False)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def _split_list_string(name: str, value: str) -> List[Any]:
+    """Turns a string the model returned for a list field into a list of strings."""
+    stripped = value.strip()
+    if stripped.startswith("["):
+        try:
+            parsed = json.loads(stripped, strict=False)
+            if isinstance(parsed, list):
+                return parsed
+        except json.JSONDecodeError:
+            pass
+    lines = [_BULLET_PATTERN.sub("", line).strip() for line in stripped.splitlines()]
+    lines = [line for line in lines if line]
+    if len(lines) == 1 and name in COMMA_SEPARATED_FIELDS:
+        lines = [item.strip() for item in lines[0].split(",") if item.strip()]
+    return lines
+
+
+def _as_str(item: Any) -> str:
+    """Flattens a non-string list item into a string."""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, (dict, list)):
+        return json.dumps(item)
+    return str(item)
+
+
+def coerce_fields(data: dict, response_model: Type[BaseModel]) -> dict:
+    """Coerces near-miss field values (strings for lists, out-of-range scores) to what the model expects."""
+    data = dict(data)
+    for name, field in response_model.model_fields.items():
+        if name not in data:
+            continue
+        value = data[name]
+        if get_origin(field.annotation) is list:
+            (item_type,) = get_args(field.annotation) or (Any,)
+            if isinstance(value, str):
+                value = _split_list_string(name, value)
+            elif isinstance(value, dict):
+                value = [value]
+            if item_type is str and isinstance(value, list):
+                value = [_as_str(item) for item in value]
+        elif name in NUMERIC_FIELD_RANGES:
+            if isinstance(value, str):
+                match = _NUMBER_PATTERN.search(value)
+                value = float(match.group()) if match else value
+            if isinstance(value, (int, float)):
+                low, high = NUMERIC_FIELD_RANGES[name]
+                value = min(max(float(value), low), high)
+        data[name] = value
+    return data
+
+
+def repair_structured_output(content: Any, response_model: Type[ModelT]) -> Optional[ModelT]:
+    """
+    Returns `content` as an instance of `response_model`, repairing it locally if needed.
+
+    Agno leaves the raw string on the response when it can't parse the structured
+    output, so this strips code fences, closes truncated JSON and coerces near-miss
+    fields before giving up. Returns None when the content can't be repaired.
+
+    A string that is already valid JSON for `response_model` (e.g. a streamed response
+    that agno didn't parse) is counted as "parsed", not "repaired".
+    """
+    if isinstance(content, response_model):
+        coerced = coerce_fields(content.model_dump(), response_model)
+        record_repair("parsed")
+        return response_model.model_validate(coerced)
+
+    if isinstance(content, BaseModel):
+        content = content.model_dump()
+    if isinstance(content, str):
+        try:
+            parsed = response_model.model_validate_json(content)
+        except ValidationError:
+            content = extract_json(content)
+        else:
+            record_repair("parsed")
+            return response_model.model_validate(coerce_fields(parsed.model_dump(), response_model))
+    if not isinstance(content, dict):
+        return None
+
+    try:
+        repaired = response_model.model_validate(coerce_fields(content, response_model))
+    except ValidationError:
+        return None
+    record_repair("repaired")
+    return repaired
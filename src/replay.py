@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import difflib
+import functools
+import hashlib
+import json
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+import yaml
+
+# Load configuration from YAML file
+with open("config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+replay_config = config.get("replay", {})
+
+# Toolkits whose calls leave the machine. Local tools such as ReasoningTools update agent
+# state when they run, so they are always executed for real.
+REPLAYED_TOOLKITS = {"tavily_tools"}
+
+# Parts of a request that change between otherwise identical runs. They are masked in each
+# string value before serializing, so a pattern can never run across escaped line breaks.
+_VOLATILE_PATTERNS = [
+    (re.compile(r"The current time is \d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?(?:[+-]\d{2}:\d{2})?"), "The current time is <time>"),
+    (re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"), "<uuid>"),
+]
+
+
+# How many times each request has been seen in the workflow run in the current context.
+_run_seen: ContextVar[Optional[Counter]] = ContextVar("replay_run_seen", default=None)
+
+
+def start_replay_run():
+    """
+    Starts numbering identical requests from 1 again for the current workflow run, so every
+    run in a long-lived process (a worker, the Streamlit server) replays the same recordings.
+    Concurrent runs each get their own numbering.
+    """
+    _run_seen.set(Counter())
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when no recording exists for a request."""
+
+
+def _mask_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(key): _mask_volatile(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_mask_volatile(item) for item in value]
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = str(value)
+    for pattern, replacement in _VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def normalize_request(request: Any) -> str:
+    """Serializes a request canonically, with timestamps and ids masked, so equal requests hash equally."""
+    return json.dumps(_mask_volatile(request), sort_keys=True)
+
+
+class ReplayStore:
+    """
+    Records model, tool and knowledge-base calls to disk, or serves them back from disk.
+
+    Each call is stored under `<directory>/<kind>/<hash>-<n>.json`, where the hash is of the
+    normalized request and `n` counts identical requests within the workflow run (see
+    `start_replay_run`), so a retried request replays its second response. In replay mode, recorded durations are slept for, scaled by
+    `latency_scale` (0 replays as fast as possible).
+    """
+
+    def __init__(self, directory: str, mode: str, latency_scale: float = 0.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        # Used for calls made outside a workflow run.
+        self._seen: Counter = Counter()
+
+    @classmethod
+    def from_config(cls) -> Optional["ReplayStore"]:
+        """
+        Creates a store from the `replay` section of `config.yaml`, or returns None when replay is off.
+        The REPLAY_MODE environment variable overrides the configured mode.
+        """
+        mode = os.getenv("REPLAY_MODE", replay_config.get("mode", "off"))
+        if mode == "off":
+            return None
+        return cls(
+            directory=replay_config.get("dir", "tmp/replay"),
+            mode=mode,
+            latency_scale=replay_config.get("latency_scale", 0.0),
+        )
+
+    def _path(self, kind: str, request: Any) -> Path:
+        digest = hashlib.sha256(normalize_request(request).encode()).hexdigest()[:32]
+        seen = _run_seen.get()
+        if seen is None:
+            seen = self._seen
+        seen[(kind, digest)] += 1
+        return self.directory / kind / f"{digest}-{seen[(kind, digest)]}.json"
+
+    def _load(self, path: Path) -> Dict[str, Any]:
+        if not path.exists():
+            raise ReplayMissError(f"No recording at {path}. Re-run in record mode.")
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _save(self, path: Path, request: Any, response: Any, duration: float):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"request": request, "response": response, "duration": duration}, f, default=str, indent=2)
+
+    def call(self, kind: str, request: Any, fn: Callable[[], Any], encode=lambda x: x, decode=lambda x: x) -> Any:
+        """Runs `fn()` and records its result, or returns the recorded result in replay mode."""
+        path = self._path(kind, request)
+        if self.mode == "replay":
+            recording = self._load(path)
+            time.sleep(recording["duration"] * self.latency_scale)
+            return decode(recording["response"])
+        started = time.perf_counter()
+        result = fn()
+        self._save(path, request, encode(result), time.perf_counter() - started)
+        return result
+
+    async def acall(self, kind: str, request: Any, fn: Callable[[], Any], encode=lambda x: x, decode=lambda x: x) -> Any:
+        """Async version of `call`, for a function returning an awaitable."""
+        path = self._path(kind, request)
+        if self.mode == "replay":
+            recording = self._load(path)
+            await asyncio.sleep(recording["duration"] * self.latency_scale)
+            return decode(recording["response"])
+        started = time.perf_counter()
+        result = await fn()
+        self._save(path, request, encode(result), time.perf_counter() - started)
+        return result
+
+    def call_stream(self, kind: str, request: Any, fn: Callable[[], Iterator], encode=lambda x: x, decode=lambda x: x) -> Iterator:
+        """Streams from `fn()` while recording every chunk, or streams the recorded chunks in replay mode."""
+        path = self._path(kind, request)
+        if self.mode == "replay":
+            recording = self._load(path)
+            time.sleep(recording["duration"] * self.latency_scale)
+            for chunk in recording["response"]:
+                yield decode(chunk)
+            return
+        started = time.perf_counter()
+        chunks = []
+        for chunk in fn():
+            chunks.append(encode(chunk))
+            yield chunk
+        self._save(path, request, chunks, time.perf_counter() - started)
+
+    async def acall_stream(self, kind: str, request: Any, fn: Callable[[], AsyncIterator], encode=lambda x: x, decode=lambda x: x) -> AsyncIterator:
+        """Async version of `call_stream`."""
+        path = self._path(kind, request)
+        if self.mode == "replay":
+            recording = self._load(path)
+            await asyncio.sleep(recording["duration"] * self.latency_scale)
+            for chunk in recording["response"]:
+                yield decode(chunk)
+            return
+        started = time.perf_counter()
+        chunks = []
+        async for chunk in fn():
+            chunks.append(encode(chunk))
+            yield chunk
+        self._save(path, request, chunks, time.perf_counter() - started)
+
+
+replay_store = ReplayStore.from_config()
+
+
+def _wrap_model(model: Any, store: ReplayStore):
+    """Routes an OpenAI-compatible model's requests through the replay store."""
+    from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+    def request(messages, response_format=None, tools=None, tool_choice=None) -> Dict[str, Any]:
+        return {
+            "model": model.id,
+            "messages": [model._format_message(m) for m in messages],
+            "params": model.get_request_params(response_format=response_format, tools=tools, tool_choice=tool_choice),
+        }
+
+    def dump(response: Any) -> Dict[str, Any]:
+        return response.model_dump(mode="json")
+
+    invoke, ainvoke = model.invoke, model.ainvoke
+    invoke_stream, ainvoke_stream = model.invoke_stream, model.ainvoke_stream
+
+    def replayed_invoke(messages, response_format=None, tools=None, tool_choice=None):
+        return store.call(
+            "model",
+            request(messages, response_format, tools, tool_choice),
+            lambda: invoke(messages, response_format=response_format, tools=tools, tool_choice=tool_choice),
+            encode=dump,
+            decode=ChatCompletion.model_validate,
+        )
+
+    async def replayed_ainvoke(messages, response_format=None, tools=None, tool_choice=None):
+        return await store.acall(
+            "model",
+            request(messages, response_format, tools, tool_choice),
+            lambda: ainvoke(messages, response_format=response_format, tools=tools, tool_choice=tool_choice),
+            encode=dump,
+            decode=ChatCompletion.model_validate,
+        )
+
+    def replayed_invoke_stream(messages, response_format=None, tools=None, tool_choice=None):
+        return store.call_stream(
+            "model",
+            request(messages, response_format, tools, tool_choice),
+            lambda: invoke_stream(messages, response_format=response_format, tools=tools, tool_choice=tool_choice),
+            encode=dump,
+            decode=ChatCompletionChunk.model_validate,
+        )
+
+    def replayed_ainvoke_stream(messages, response_format=None, tools=None, tool_choice=None):
+        return store.acall_stream(
+            "model",
+            request(messages, response_format, tools, tool_choice),
+            lambda: ainvoke_stream(messages, response_format=response_format, tools=tools, tool_choice=tool_choice),
+            encode=dump,
+            decode=ChatCompletionChunk.model_validate,
+        )
+
+    model.invoke, model.ainvoke = replayed_invoke, replayed_ainvoke
+    model.invoke_stream, model.ainvoke_stream = replayed_invoke_stream, replayed_ainvoke_stream
+
+
+def _wrap_function(function: Any, store: ReplayStore):
+    """Routes a tool function's calls through the replay store."""
+    entrypoint = function.entrypoint
+
+    @functools.wraps(entrypoint)
+    def replayed(*args, **kwargs):
+        return store.call(
+            "tool",
+            {"tool": function.name, "args": args, "kwargs": kwargs},
+            lambda: entrypoint(*args, **kwargs),
+        )
+
+    function.entrypoint = replayed
+    # agno's own tool cache would skip the entrypoint, so the call would never be recorded.
+    function.cache_results = False
+
+
+def _wrap_vector_db(vector_db: Any, store: ReplayStore):
+    """Routes knowledge-base searches, including their query embeddings, through the replay store."""
+    from agno.document import Document
+
+    search, async_search = vector_db.search, vector_db.async_search
+
+    def encode(documents):
+        return [document.to_dict() for document in documents]
+
+    def decode(documents):
+        return [Document.from_dict(document) for document in documents]
+
+    def replayed_search(query, limit=5, filters=None):
+        return store.call(
+            "knowledge",
+            {"query": query, "limit": limit, "filters": filters},
+            lambda: search(query=query, limit=limit, filters=filters),
+            encode=encode,
+            decode=decode,
+        )
+
+    async def replayed_async_search(query, limit=5, filters=None):
+        return await store.acall(
+            "knowledge",
+            {"query": query, "limit": limit, "filters": filters},
+            lambda: async_search(query=query, limit=limit, filters=filters),
+            encode=encode,
+            decode=decode,
+        )
+
+    vector_db.search, vector_db.async_search = replayed_search, replayed_async_search
+
+
+def instrument(store: ReplayStore, *agents_or_teams: Any):
+    """
+    Routes the models, network tools and knowledge bases of agents and teams (and their members)
+    through `store`. Agents reachable more than once, e.g. through two teams, are wrapped once.
+    """
+    from agno.tools.toolkit import Toolkit
+
+    seen = set()
+    pending = list(agents_or_teams)
+    while pending:
+        agent_or_team = pending.pop()
+        if id(agent_or_team) in seen:
+            continue
+        seen.add(id(agent_or_team))
+
+        if agent_or_team.model is not None:
+            _wrap_model(agent_or_team.model, store)
+        for tool in getattr(agent_or_team, "tools", None) or []:
+            if isinstance(tool, Toolkit) and tool.name in REPLAYED_TOOLKITS:
+                for function in tool.functions.values():
+                    _wrap_function(function, store)
+        knowledge = getattr(agent_or_team, "knowledge", None)
+        if knowledge is not None and knowledge.vector_db is not None:
+            _wrap_vector_db(knowledge.vector_db, store)
+        pending.extend(getattr(agent_or_team, "members", None) or [])
+
+
+def save_run(final_post: Any, step_timings: Dict[str, float]) -> Optional[Path]:
+    """
+    Saves the final post and per-step timings of a run under `<dir>/runs/`, so runs from
+    different commits can be compared with `python -m src.replay diff`.
+    """
+    if replay_store is None:
+        return None
+    label = os.getenv("REPLAY_RUN_LABEL") or time.strftime("%Y%m%d_%H%M%S")
+    path = replay_store.directory / "runs" / f"{label}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "mode": replay_store.mode,
+                "final_post": final_post.model_dump() if hasattr(final_post, "model_dump") else final_post,
+                "step_timings": step_timings,
+            },
+            f,
+            indent=2,
+        )
+    return path
+
+
+def diff_runs(before_path: str, after_path: str) -> str:
+    """Returns a readable diff of the final posts and step timings of two saved runs."""
+    with open(before_path, "r") as f:
+        before = json.load(f)
+    with open(after_path, "r") as f:
+        after = json.load(f)
+
+    lines = []
+    before_post, after_post = before["final_post"], after["final_post"]
+    for field in ("title", "date", "tags"):
+        if before_post.get(field) != after_post.get(field):
+            lines.append(f"{field}: {before_post.get(field)!r} -> {after_post.get(field)!r}")
+    lines.extend(
+        difflib.unified_diff(
+            before_post.get("draft", "").splitlines(),
+            after_post.get("draft", "").splitlines(),
+            fromfile=f"{before_path}:draft",
+            tofile=f"{after_path}:draft",
+            lineterm="",
+        )
+    )
+
+    lines.append("")
+    lines.append(f"{'step':<24}{'before':>10}{'after':>10}{'change':>10}")
+    for step in dict.fromkeys([*before["step_timings"], *after["step_timings"]]):
+        old, new = before["step_timings"].get(step), after["step_timings"].get(step)
+        change = f"{new - old:+.2f}" if old is not None and new is not None else ""
+        old_text = f"{old:.2f}" if old is not None else "-"
+        new_text = f"{new:.2f}" if new is not None else "-"
+        lines.append(f"{step:<24}{old_text:>10}{new_text:>10}{change:>10}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two recorded or replayed workflow runs.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    diff_parser = subparsers.add_parser("diff", help="Diff the final posts and step timings of two runs.")
+    diff_parser.add_argument("before")
+    diff_parser.add_argument("after")
+    args = parser.parse_args()
+    print(diff_runs(args.before, args.after))
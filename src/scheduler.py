@@ -0,0 +1,342 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from .cache_store import connect
+
+T = TypeVar("T")
+
+
+def has_free_slot(running: Dict[str, int], priority: str, max_concurrency: int, reservations: Dict[str, int]) -> bool:
+    """
+    Returns True if a `priority` job may start, given how many jobs of each class are running.
+    A class can always use its own reserved slots; other classes' unused reservations are held back.
+    """
+    if sum(running.values()) >= max_concurrency:
+        return False
+    if running.get(priority, 0) < reservations[priority]:
+        return True
+    held = sum(max(running.get(name, 0), reserved) for name, reserved in reservations.items())
+    return held < max_concurrency
+
+
+@dataclass
+class _QueuedJob:
+    """A job waiting for a slot, woken on its own event loop when the slot is granted."""
+
+    tenant: str
+    loop: asyncio.AbstractEventLoop
+    ready: asyncio.Future
+    granted: bool = False
+
+
+@dataclass
+class _ClassStats:
+    """Running counters for one priority class."""
+
+    # Local slots held (including jobs still waiting for a shared slot), and jobs actually running.
+    running: int = 0
+    active: int = 0
+    started: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+
+class SharedSlots:
+    """
+    Concurrency slots kept in the shared SQLite database, so every process that runs workflows
+    (the Streamlit server, worker processes, the command line) counts against one
+    `max_concurrency` and the same per-class reservations.
+
+    Holders refresh a heartbeat while their job runs. A slot whose heartbeat is older than
+    `stale_seconds`, e.g. because its process crashed, is freed.
+    """
+
+    def __init__(
+        self,
+        db_file: str,
+        max_concurrency: int,
+        reservations: Dict[str, int],
+        table_name: str = "scheduler_slots",
+        busy_timeout_ms: int = 5000,
+        stale_seconds: float = 60.0,
+        poll_interval: float = 1.0,
+    ):
+        self.db_file = db_file
+        self.max_concurrency = max_concurrency
+        self.reservations = dict(reservations)
+        self.table_name = table_name
+        self.busy_timeout_ms = busy_timeout_ms
+        self.stale_seconds = stale_seconds
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._connection().execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                holder TEXT PRIMARY KEY,
+                priority TEXT NOT NULL,
+                acquired_at REAL NOT NULL,
+                heartbeat_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # Calls run in worker threads via asyncio.to_thread, so keep one connection per thread.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = connect(self.db_file, self.busy_timeout_ms)
+            self._local.connection = connection
+        return connection
+
+    def try_acquire(self, holder: str, priority: str) -> bool:
+        """Takes a slot for `holder` if one is free for `priority`, and returns whether it did."""
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                f"DELETE FROM {self.table_name} WHERE heartbeat_at < ?", (now - self.stale_seconds,)
+            )
+            running = dict(
+                connection.execute(f"SELECT priority, COUNT(*) FROM {self.table_name} GROUP BY priority").fetchall()
+            )
+            acquired = has_free_slot(running, priority, self.max_concurrency, self.reservations)
+            if acquired:
+                connection.execute(
+                    f"INSERT INTO {self.table_name} (holder, priority, acquired_at, heartbeat_at) VALUES (?, ?, ?, ?)",
+                    (holder, priority, now, now),
+                )
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        return acquired
+
+    def heartbeat(self, holder: str):
+        self._connection().execute(
+            f"UPDATE {self.table_name} SET heartbeat_at = ? WHERE holder = ?", (time.time(), holder)
+        )
+
+    def release(self, holder: str):
+        self._connection().execute(f"DELETE FROM {self.table_name} WHERE holder = ?", (holder,))
+
+    def running(self) -> Dict[str, int]:
+        """Returns the number of live slots held in each priority class, across all processes."""
+        rows = self._connection().execute(
+            f"SELECT priority, COUNT(*) FROM {self.table_name} WHERE heartbeat_at >= ? GROUP BY priority",
+            (time.time() - self.stale_seconds,),
+        ).fetchall()
+        return dict(rows)
+
+    @asynccontextmanager
+    async def hold(self, priority: str) -> AsyncIterator[None]:
+        """Waits for a slot in `priority` and keeps it, with a heartbeat, until the block exits."""
+        holder = f"{os.getpid()}-{uuid.uuid4().hex}"
+        while not await asyncio.to_thread(self.try_acquire, holder, priority):
+            await asyncio.sleep(self.poll_interval)
+        heartbeat = asyncio.create_task(self._keep_alive(holder))
+        try:
+            yield
+        finally:
+            heartbeat.cancel()
+            await asyncio.to_thread(self.release, holder)
+
+    async def _keep_alive(self, holder: str):
+        while True:
+            await asyncio.sleep(self.stale_seconds / 3)
+            await asyncio.to_thread(self.heartbeat, holder)
+
+
+class GenerationScheduler:
+    """
+    Limits how many workflow runs execute at once, sharing the slots between priority classes.
+
+    Classes are given highest priority first. Each class can reserve slots that only it may
+    use, so interactive requests never wait behind a bulk campaign. Unreserved slots go to the
+    highest-priority class with queued work, and within a class jobs are taken round-robin
+    across tenants so one tenant's batch can't starve the others.
+
+    The scheduler can be shared between event loops and threads. With `shared_slots`, a job
+    that gets a slot here also waits for a slot in the shared database, so the limits and
+    reservations hold across every process.
+    """
+
+    def __init__(self, max_concurrency: int, reservations: Dict[str, int], shared_slots: Optional[SharedSlots] = None):
+        if not reservations:
+            raise ValueError("At least one priority class is required.")
+        if sum(reservations.values()) > max_concurrency:
+            raise ValueError("Reserved slots exceed max_concurrency.")
+        self.max_concurrency = max_concurrency
+        self.reservations = dict(reservations)
+        self.shared_slots = shared_slots
+        self._queues: Dict[str, Dict[str, Deque[_QueuedJob]]] = {name: {} for name in reservations}
+        self._tenants: Dict[str, Deque[str]] = {name: deque() for name in reservations}
+        self._stats: Dict[str, _ClassStats] = {name: _ClassStats() for name in reservations}
+        # When each job that hasn't started running yet was submitted, per class.
+        self._waiting: Dict[str, Dict[object, float]] = {name: {} for name in reservations}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(
+        cls, scheduler_config: Dict[str, Any], storage_config: Optional[Dict[str, Any]] = None
+    ) -> "GenerationScheduler":
+        """
+        Creates a scheduler from the `scheduler` section of `config.yaml`. Given the `storage`
+        section and `shared: true`, slots are shared with other processes through its database.
+        """
+        classes = scheduler_config.get("priority_classes") or {"interactive": {"reserved": 1}, "bulk": {"reserved": 0}}
+        max_concurrency = scheduler_config.get("max_concurrency", 4)
+        reservations = {name: (settings or {}).get("reserved", 0) for name, settings in classes.items()}
+        shared_slots = None
+        if storage_config is not None and scheduler_config.get("shared", False):
+            shared_slots = SharedSlots(
+                db_file=storage_config.get("db_file", "tmp/blog_post_generator.db"),
+                max_concurrency=max_concurrency,
+                reservations=reservations,
+                table_name=scheduler_config.get("slots_table", "scheduler_slots"),
+                busy_timeout_ms=storage_config.get("busy_timeout_ms", 5000),
+                stale_seconds=scheduler_config.get("slot_stale_seconds", 60.0),
+                poll_interval=scheduler_config.get("slot_poll_interval", 1.0),
+            )
+        return cls(max_concurrency=max_concurrency, reservations=reservations, shared_slots=shared_slots)
+
+    async def run(self, job: Callable[[], Awaitable[T]], priority: str, tenant: str = "default") -> T:
+        """Waits for a slot in `priority`, then runs `job()` and returns its result."""
+        if priority not in self.reservations:
+            raise ValueError(f"Unknown priority class: {priority}")
+        token = object()
+        submitted_at = time.monotonic()
+        with self._lock:
+            self._waiting[priority][token] = submitted_at
+        try:
+            await self._acquire(priority, tenant)
+            try:
+                if self.shared_slots is None:
+                    self._start(priority, token, submitted_at)
+                    return await self._run_active(job, priority)
+                async with self.shared_slots.hold(priority):
+                    self._start(priority, token, submitted_at)
+                    return await self._run_active(job, priority)
+            finally:
+                self._release(priority)
+        finally:
+            with self._lock:
+                self._waiting[priority].pop(token, None)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns queue depth, running jobs and wait times (in seconds) for each priority class.
+        `oldest_wait` is how long the longest-waiting queued job has waited so far; with shared
+        slots, `running_all_processes` counts runs in every process.
+        """
+        now = time.monotonic()
+        with self._lock:
+            result = {
+                name: {
+                    "queue_depth": len(self._waiting[name]),
+                    "running": stats.active,
+                    "reserved": self.reservations[name],
+                    "started": stats.started,
+                    "avg_wait": stats.total_wait / stats.started if stats.started else 0.0,
+                    "max_wait": stats.max_wait,
+                    "oldest_wait": now - min(self._waiting[name].values()) if self._waiting[name] else 0.0,
+                }
+                for name, stats in self._stats.items()
+            }
+        if self.shared_slots is not None:
+            shared_running = self.shared_slots.running()
+            for name in result:
+                result[name]["running_all_processes"] = shared_running.get(name, 0)
+        return result
+
+    def _start(self, priority: str, token: object, submitted_at: float):
+        wait = time.monotonic() - submitted_at
+        with self._lock:
+            self._waiting[priority].pop(token, None)
+            stats = self._stats[priority]
+            stats.active += 1
+            stats.started += 1
+            stats.total_wait += wait
+            stats.max_wait = max(stats.max_wait, wait)
+
+    async def _run_active(self, job: Callable[[], Awaitable[T]], priority: str) -> T:
+        try:
+            return await job()
+        finally:
+            with self._lock:
+                self._stats[priority].active -= 1
+
+    async def _acquire(self, priority: str, tenant: str):
+        loop = asyncio.get_running_loop()
+        job = _QueuedJob(tenant=tenant, loop=loop, ready=loop.create_future())
+        with self._lock:
+            if tenant not in self._queues[priority]:
+                self._queues[priority][tenant] = deque()
+                self._tenants[priority].append(tenant)
+            self._queues[priority][tenant].append(job)
+            self._dispatch()
+        try:
+            await job.ready
+        except asyncio.CancelledError:
+            with self._lock:
+                if job.granted:
+                    self._stats[priority].running -= 1
+                    self._dispatch()
+                else:
+                    self._remove(priority, job)
+            raise
+
+    def _release(self, priority: str):
+        with self._lock:
+            self._stats[priority].running -= 1
+            self._dispatch()
+
+    def _can_start(self, priority: str) -> bool:
+        running = {name: stats.running for name, stats in self._stats.items()}
+        return has_free_slot(running, priority, self.max_concurrency, self.reservations)
+
+    def _next_job(self, priority: str) -> Optional[_QueuedJob]:
+        tenants = self._tenants[priority]
+        if not tenants:
+            return None
+        tenant = tenants.popleft()
+        jobs = self._queues[priority][tenant]
+        job = jobs.popleft()
+        if jobs:
+            tenants.append(tenant)
+        else:
+            del self._queues[priority][tenant]
+        return job
+
+    def _remove(self, priority: str, job: _QueuedJob):
+        jobs = self._queues[priority].get(job.tenant)
+        if jobs is None or job not in jobs:
+            return
+        jobs.remove(job)
+        if not jobs:
+            del self._queues[priority][job.tenant]
+            self._tenants[priority].remove(job.tenant)
+
+    def _dispatch(self):
+        # Called with the lock held. Classes are checked in priority order.
+        for priority in self.reservations:
+            while self._can_start(priority):
+                job = self._next_job(priority)
+                if job is None:
+                    break
+                self._stats[priority].running += 1
+                job.granted = True
+                job.loop.call_soon_threadsafe(_grant, job.ready)
+
+
+def _grant(ready: asyncio.Future):
+    if not ready.done():
+        ready.set_result(None)
@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+from .cache_store import connect
+
+# Load configuration from YAML file
+with open("config.yaml", "r") as f:
+    config = yaml.safe_load(f)
+
+storage_config = config.get("storage", {})
+worker_config = config.get("worker", {})
+priority_classes = list((config.get("scheduler", {}).get("priority_classes") or {"interactive": {}, "bulk": {}}).keys())
+
+
+@dataclass
+class GenerationJob:
+    """A blog post generation request claimed from the job queue."""
+
+    id: int
+    idea: str
+    tone: str
+    priority: str
+    tenant: str
+    attempts: int
+    worker: str
+
+
+class JobQueue:
+    """
+    A job queue in the shared SQLite database, so worker processes on one machine can pull
+    generation requests from it. Jobs are claimed in priority-class order. Within a class,
+    tenants take turns (the least recently served tenant goes next, oldest job first), so one
+    tenant's bulk batch can't starve the others.
+
+    A running job's worker renews its lease while the job waits for a scheduler slot and runs.
+    A job whose lease expires (e.g. because its worker crashed) is claimed again until it has used
+    up its attempts, then marked failed.
+    """
+
+    def __init__(self, db_file: str, table_name: str = "generation_jobs", busy_timeout_ms: int = 5000):
+        self.table_name = table_name
+        self.connection = connect(db_file, busy_timeout_ms)
+        self.connection.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idea TEXT NOT NULL,
+                tone TEXT NOT NULL,
+                priority TEXT NOT NULL,
+                priority_rank INTEGER NOT NULL,
+                tenant TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        self.connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table_name}_claim ON {self.table_name} (status, priority_rank, id)"
+        )
+        self.connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table_name}_tenant ON {self.table_name} (priority_rank, tenant, started_at)"
+        )
+
+    @classmethod
+    def from_config(cls) -> "JobQueue":
+        """Creates a job queue in the database configured under `storage` in `config.yaml`."""
+        return cls(
+            db_file=storage_config.get("db_file", "tmp/blog_post_generator.db"),
+            table_name=worker_config.get("jobs_table", "generation_jobs"),
+            busy_timeout_ms=storage_config.get("busy_timeout_ms", 5000),
+        )
+
+    def enqueue(self, idea: str, tone: str, priority: str = "bulk", tenant: str = "default") -> int:
+        """Adds a job to the queue and returns its id."""
+        if priority not in priority_classes:
+            raise ValueError(f"Unknown priority class: {priority}")
+        cursor = self.connection.execute(
+            f"""
+            INSERT INTO {self.table_name} (idea, tone, priority, priority_rank, tenant, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (idea, tone, priority, priority_classes.index(priority), tenant, time.time()),
+        )
+        return cursor.lastrowid
+
+    def claim(self, worker: str, lease_seconds: float, max_attempts: int) -> Optional[GenerationJob]:
+        """Marks the next job as running for `worker` and returns it, or None if the queue is empty."""
+        now = time.time()
+        expired = now - lease_seconds
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can't claim the same job.
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            # A job that keeps taking its worker down never reaches fail(), so give up on it here.
+            self.connection.execute(
+                f"""
+                UPDATE {self.table_name}
+                SET status = 'failed', error = 'Lease expired on the last attempt.', finished_at = ?
+                WHERE status = 'running' AND started_at < ? AND attempts >= ?
+                """,
+                (now, expired, max_attempts),
+            )
+            row = self.connection.execute(
+                f"""
+                WITH claimable AS (
+                    SELECT id, priority_rank, tenant FROM {self.table_name}
+                    WHERE status = 'queued' OR (status = 'running' AND started_at < ?)
+                ),
+                heads AS (
+                    SELECT tenant, priority_rank, MIN(id) AS id FROM claimable
+                    WHERE priority_rank = (SELECT MIN(priority_rank) FROM claimable)
+                    GROUP BY tenant
+                )
+                SELECT jobs.id, jobs.idea, jobs.tone, jobs.priority, jobs.tenant, jobs.attempts
+                FROM heads JOIN {self.table_name} AS jobs ON jobs.id = heads.id
+                ORDER BY (
+                    SELECT MAX(served.started_at) FROM {self.table_name} AS served
+                    WHERE served.priority_rank = heads.priority_rank AND served.tenant = heads.tenant
+                ), heads.id
+                LIMIT 1
+                """,
+                (expired,),
+            ).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    f"""
+                    UPDATE {self.table_name}
+                    SET status = 'running', worker = ?, started_at = ?, attempts = attempts + 1
+                    WHERE id = ?
+                    """,
+                    (worker, now, row[0]),
+                )
+            self.connection.execute("COMMIT")
+        except sqlite3.Error:
+            self.connection.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job_id, idea, tone, priority, tenant, attempts = row
+        return GenerationJob(
+            id=job_id, idea=idea, tone=tone, priority=priority, tenant=tenant, attempts=attempts + 1, worker=worker
+        )
+
+    def renew(self, job: GenerationJob) -> bool:
+        """Extends a running job's lease. Returns False if the job was claimed again since."""
+        cursor = self.connection.execute(
+            f"""
+            UPDATE {self.table_name} SET started_at = ?
+            WHERE id = ? AND status = 'running' AND worker = ? AND attempts = ?
+            """,
+            (time.time(), job.id, job.worker, job.attempts),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job: GenerationJob) -> bool:
+        """
+        Marks a job as done. Returns False if the job's lease expired and it was claimed again
+        since, in which case the job is left to its new owner.
+        """
+        cursor = self.connection.execute(
+            f"""
+            UPDATE {self.table_name} SET status = 'done', error = NULL, finished_at = ?
+            WHERE id = ? AND status = 'running' AND worker = ? AND attempts = ?
+            """,
+            (time.time(), job.id, job.worker, job.attempts),
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job: GenerationJob, error: str, max_attempts: int) -> bool:
+        """
+        Puts a failed job back in the queue, or marks it failed once it has used up its attempts.
+        Returns False if the job was claimed again since, like `complete`.
+        """
+        status = "queued" if job.attempts < max_attempts else "failed"
+        cursor = self.connection.execute(
+            f"""
+            UPDATE {self.table_name} SET status = ?, error = ?, finished_at = ?
+            WHERE id = ? AND status = 'running' AND worker = ? AND attempts = ?
+            """,
+            (status, error, time.time(), job.id, job.worker, job.attempts),
+        )
+        return cursor.rowcount == 1
+
+    def counts(self) -> Dict[str, int]:
+        """Returns the number of jobs in each status."""
+        rows = self.connection.execute(
+            f"SELECT status, COUNT(*) FROM {self.table_name} GROUP BY status"
+        ).fetchall()
+        return dict(rows)
+
+
+async def run_job(queue: JobQueue, job: GenerationJob, lease_seconds: float) -> Any:
+    """
+    Runs a job through the workflow scheduler, in its priority class and tenant, renewing
+    the job's lease until it finishes.
+    """
+    # Imported here so each process sets up its own agents, tracing and storage connections.
+    from .blog_post_generator_workflow import generate_blog_post
+
+    async def keep_lease():
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            queue.renew(job)
+
+    renewal = asyncio.create_task(keep_lease())
+    try:
+        return await generate_blog_post(job.idea, job.tone, priority=job.priority, tenant=job.tenant)
+    finally:
+        renewal.cancel()
+
+
+def run_worker(worker: str, drain: bool = False):
+    """
+    Pulls jobs from the queue and runs the workflow for each, one at a time.
+    With `drain`, the worker exits once the queue is empty instead of polling for more.
+    """
+
+    queue = JobQueue.from_config()
+    poll_interval = worker_config.get("poll_interval", 2.0)
+    lease_seconds = worker_config.get("lease_seconds", 300)
+    max_attempts = worker_config.get("max_attempts", 3)
+
+    while True:
+        job = queue.claim(worker, lease_seconds, max_attempts)
+        if job is None:
+            if drain:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        print(f"[{worker}] Job {job.id} (attempt {job.attempts}): {job.idea}")
+        try:
+            result = asyncio.run(run_job(queue, job, lease_seconds))
+            if not result or not result.content:
+                raise ValueError("Workflow did not produce any content.")
+            if queue.complete(job):
+                print(f"[{worker}] Job {job.id} done.")
+            else:
+                print(f"[{worker}] Job {job.id} finished after its lease expired; it was claimed again.")
+        except Exception as e:
+            if queue.fail(job, str(e), max_attempts):
+                print(f"[{worker}] Job {job.id} failed: {e}")
+            else:
+                print(f"[{worker}] Job {job.id} failed after its lease expired; it was claimed again.")
+
+
+def run_workers(processes: int, drain: bool = False):
+    """Starts `processes` worker processes and waits for them to exit."""
+    context = multiprocessing.get_context("spawn")
+    workers: List[multiprocessing.Process] = [
+        context.Process(target=run_worker, args=(f"worker-{os.getpid()}-{index}", drain), daemon=True)
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queue blog post generation jobs and run worker processes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Add jobs to the queue.")
+    enqueue_parser.add_argument("ideas", nargs="*", help="Blog post ideas to generate.")
+    enqueue_parser.add_argument("--file", help="A file with one blog post idea per line.")
+    enqueue_parser.add_argument("--tone", default="Informative and engaging")
+    enqueue_parser.add_argument("--priority", default="bulk", choices=priority_classes)
+    enqueue_parser.add_argument("--tenant", default="default")
+
+    run_parser = subparsers.add_parser("run", help="Run worker processes.")
+    run_parser.add_argument("--processes", type=int, default=worker_config.get("processes", os.cpu_count() or 1))
+    run_parser.add_argument("--drain", action="store_true", help="Exit once the queue is empty.")
+
+    subparsers.add_parser("status", help="Show the number of jobs in each status.")
+
+    args = parser.parse_args()
+    if args.command == "enqueue":
+        ideas = list(args.ideas)
+        if args.file:
+            with open(args.file, "r") as f:
+                ideas.extend(line.strip() for line in f if line.strip())
+        queue = JobQueue.from_config()
+        for idea in ideas:
+            queue.enqueue(idea, args.tone, priority=args.priority, tenant=args.tenant)
+        print(f"Queued {len(ideas)} jobs.")
+    elif args.command == "run":
+        run_workers(args.processes, drain=args.drain)
+    else:
+        print(JobQueue.from_config().counts())
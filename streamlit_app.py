@@ -1,9 +1,12 @@
 import streamlit as st
-import asyncio
-import os
+import time
+import uuid
 from dotenv import load_dotenv
-from src.blog_post_generator_workflow import workflow
+from src.agents import Credentials
+from src.background import BackgroundLoop
+from src.blog_post_generator_workflow import generate_blog_post, scheduler
 from src.models import FinalBlogPost
+from src.exporter import render_markdown, slugify
 
 load_dotenv()
 
@@ -15,6 +18,12 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# --- Background Event Loop ---
+# Shared by every session so runs don't block the script thread and all go through one scheduler.
+@st.cache_resource
+def get_background_loop() -> BackgroundLoop:
+    return BackgroundLoop()
+
 # --- Load Custom CSS ---
 with open("style.css") as f:
     st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
@@ -28,19 +37,30 @@ if "tone" not in st.session_state:
     st.session_state.tone = "Informative and engaging"
 if "generate" not in st.session_state:
     st.session_state.generate = False
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+if "run_future" not in st.session_state:
+    st.session_state.run_future = None
+if "run_started_at" not in st.session_state:
+    st.session_state.run_started_at = None
+if "run_error" not in st.session_state:
+    st.session_state.run_error = None
 
 # --- Sidebar ---
 with st.sidebar:
     st.title("📝 Agentic Blog Post Generator")
     st.subheader("Settings")
-    st.text_input("OpenAI API Key", value=os.getenv("OPENAI_API_KEY", ""), key="openai_api_key", type="password")
-    st.text_input("Tavily API Key", value=os.getenv("TAVILY_API_KEY", ""), key="tavily_api_key", type="password")
-    st.text_input("OpenRouter API Key", value=os.getenv("OPENROUTER_API_KEY", ""), key="openrouter_api_key", type="password")
-    with st.expander("Langsmith Settings"):
-        st.text_input("Langsmith API Key", value=os.getenv("LANGSMITH_API_KEY", ""), key="langsmith_api_key", type="password")
-        st.text_input("Langsmith Endpoint", value=os.getenv("LANGSMITH_ENDPOINT", "https://api.smith.langchain.com"), key="langsmith_endpoint")
-        st.text_input("Langsmith Project", value=os.getenv("LANGSMITH_PROJECT", "blog-post-generator-workflow"), key="langsmith_project")
-        st.checkbox("Langsmith Tracing", value=os.getenv("LANGSMITH_TRACING", "true").lower() == "true", key="langsmith_tracing")
+    st.caption("Keys are only used for your own runs. Leave a key empty to use the server's key.")
+    st.text_input("OpenAI API Key", key="openai_api_key", type="password")
+    st.text_input("Tavily API Key", key="tavily_api_key", type="password")
+    st.text_input("OpenRouter API Key", key="openrouter_api_key", type="password")
+    with st.expander("Scheduler Queues"):
+        for priority, stats in scheduler.stats().items():
+            st.write(
+                f"**{priority}**: {stats['queue_depth']} queued (oldest {stats['oldest_wait']:.1f}s), "
+                f"{stats['running']} running here, {stats.get('running_all_processes', stats['running'])} in all processes, "
+                f"avg wait {stats['avg_wait']:.1f}s, max wait {stats['max_wait']:.1f}s"
+            )
     st.markdown("---")
     st.subheader("ℹ️ About")
     st.markdown(
@@ -48,6 +68,7 @@ with st.sidebar:
         - Enter a **topic** and **tone**.
         - Click **Generate Blog Post**.
         - The workflow will generate a strategy, draft, SEO report, and final post.
+        - LangSmith tracing is configured for the whole server through the `.env` file.
         """
     )
 
@@ -89,44 +110,59 @@ with st.container():
     st.markdown("<br>", unsafe_allow_html=True)
 
 # --- Generation Logic ---
-if st.button("Generate Blog Post", key="generate_button", help="Click to start the blog post generation process.", type="primary"):
+run_in_progress = st.session_state.run_future is not None
+if st.button("Generate Blog Post", key="generate_button", help="Click to start the blog post generation process.", type="primary", disabled=run_in_progress):
     st.session_state.topic = topic_input
     st.session_state.tone = tone_input
     st.session_state.generate = True
 
-if st.session_state.generate and st.session_state.topic and st.session_state.tone:
-    with st.status("Generating your blog post...", expanded=True) as status:
-        try:
-            status.write("Step 1: Generating Blog Strategy...")
-            
-            if st.session_state.openai_api_key:
-                os.environ["OPENAI_API_KEY"] = st.session_state.openai_api_key
-            if st.session_state.tavily_api_key:
-                os.environ["TAVILY_API_KEY"] = st.session_state.tavily_api_key
-            if st.session_state.openrouter_api_key:
-                os.environ["OPENROUTER_API_KEY"] = st.session_state.openrouter_api_key
-            if st.session_state.langsmith_api_key:
-                os.environ["LANGSMITH_API_KEY"] = st.session_state.langsmith_api_key
-            if st.session_state.langsmith_endpoint:
-                os.environ["LANGSMITH_ENDPOINT"] = st.session_state.langsmith_endpoint
-            if st.session_state.langsmith_project:
-                os.environ["LANGSMITH_PROJECT"] = st.session_state.langsmith_project
-            os.environ["LANGSMITH_TRACING"] = str(st.session_state.langsmith_tracing)
-            
-            result = asyncio.run(workflow.arun(idea=st.session_state.topic, tone=st.session_state.tone))
-            
-            if result and result.content:
-                st.session_state.final_post = result.content
-                status.update(label="Blog post generated successfully!", state="complete")
-            else:
-                st.session_state.final_post = None
-                status.update(label="Workflow did not produce any content.", state="error")
-
-        except Exception as e:
-            st.session_state.final_post = None
-            status.update(label=f"An error occurred: {e}", state="error")
-    
-    st.session_state.generate = False # Reset the flag
+if st.session_state.generate and st.session_state.topic and st.session_state.tone and not run_in_progress:
+    credentials = Credentials(
+        openrouter_api_key=st.session_state.openrouter_api_key or None,
+        tavily_api_key=st.session_state.tavily_api_key or None,
+        openai_api_key=st.session_state.openai_api_key or None,
+    )
+    st.session_state.final_post = None
+    st.session_state.run_error = None
+    st.session_state.run_started_at = time.time()
+    st.session_state.run_future = get_background_loop().submit(
+        generate_blog_post(
+            idea=st.session_state.topic,
+            tone=st.session_state.tone,
+            priority="interactive",
+            tenant=st.session_state.session_id,
+            session_id=st.session_state.session_id,
+            credentials=credentials,
+        )
+    )
+st.session_state.generate = False # Reset the flag
+
+@st.fragment(run_every=2)
+def show_run_status():
+    """Polls the background run and reruns the app once its result is ready."""
+    future = st.session_state.run_future
+    if future is None:
+        return
+    if not future.done():
+        elapsed = time.time() - st.session_state.run_started_at
+        st.status(f"Generating your blog post... ({elapsed:.0f}s)", state="running")
+        return
+
+    st.session_state.run_future = None
+    try:
+        result = future.result()
+        if result and result.content:
+            st.session_state.final_post = result.content
+        else:
+            st.session_state.run_error = "Workflow did not produce any content."
+    except Exception as e:
+        st.session_state.run_error = f"An error occurred: {e}"
+    st.rerun()
+
+show_run_status()
+
+if st.session_state.run_error:
+    st.error(st.session_state.run_error)
 
 # --- Display Final Post ---
 if st.session_state.final_post:
@@ -140,7 +176,7 @@ if st.session_state.final_post:
     # --- Download Button ---
     st.download_button(
         label="⬇️ Download Blog Post",
-        data=f"# {post.title}\n\n**Date:** {post.date}\n**Tags:** {', '.join(post.tags)}\n\n---\n\n{post.draft}",
-        file_name=f"{post.title.lower().replace(' ', '_')}.md",
+        data=render_markdown(post),
+        file_name=f"{slugify(post.title)}.md",
         mime="text/markdown",
     )
\ No newline at end of file